@@ -0,0 +1,40 @@
+"""
+One-off migration for stored created_at values and quiz result retention.
+
+- Converts legacy ISO-string created_at values in quiz_results, email_captures
+  and orders to native datetimes
+- Backfills the email_captured flag on quiz_results used by the retention policy
+
+Safe to re-run. Run once per deployment from the backend directory:
+
+    python migrate_created_at.py
+"""
+import asyncio
+import sys
+
+from server import (
+    client,
+    db,
+    logger,
+    migrate_created_at_to_datetime,
+    backfill_email_captured,
+)
+
+
+async def main() -> int:
+    remaining = 0
+    try:
+        for collection in (db.quiz_results, db.email_captures, db.orders):
+            await migrate_created_at_to_datetime(collection)
+            left = await collection.count_documents({"created_at": {"$type": "string"}})
+            if left:
+                logger.warning(f"{left} string created_at values remain in {collection.name}")
+            remaining += left
+        await backfill_email_captured()
+    finally:
+        client.close()
+    return 1 if remaining else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -6,10 +6,14 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pymongo import ASCENDING, DESCENDING, UpdateOne
 from typing import List, Dict, Any, Optional
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 import asyncio
+import gzip
+import json
+from bson import ObjectId
 import resend
 
 ROOT_DIR = Path(__file__).parent
@@ -17,9 +21,25 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# tz_aware so created_at comes back as an aware UTC datetime, matching what the models produce
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ['DB_NAME']]
 
+# Retention for anonymous quiz_results (no email captured): "off", "ttl" or "archive"
+QUIZ_RESULT_RETENTION_MODES = {"off", "ttl", "archive"}
+QUIZ_RESULT_RETENTION_MODE = os.environ.get('QUIZ_RESULT_RETENTION_MODE', 'off').lower()
+if QUIZ_RESULT_RETENTION_MODE not in QUIZ_RESULT_RETENTION_MODES:
+    raise ValueError(
+        f"Invalid QUIZ_RESULT_RETENTION_MODE {QUIZ_RESULT_RETENTION_MODE!r}, "
+        f"expected one of {sorted(QUIZ_RESULT_RETENTION_MODES)}"
+    )
+QUIZ_RESULT_RETENTION_DAYS = int(os.environ.get('QUIZ_RESULT_RETENTION_DAYS', '90'))
+QUIZ_RESULT_ARCHIVE_DIR = Path(os.environ.get('QUIZ_RESULT_ARCHIVE_DIR', str(ROOT_DIR / 'archive')))
+QUIZ_RESULT_ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('QUIZ_RESULT_ARCHIVE_INTERVAL_SECONDS', '3600'))
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', '1000'))
+
+QUIZ_RESULT_TTL_INDEX = "quiz_results_retention_ttl"
+
 # Resend setup
 resend.api_key = os.environ.get('RESEND_API_KEY', '')
 SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'onboarding@resend.dev')
@@ -257,6 +277,192 @@ def calculate_quiz_results(answers: List[QuizAnswer]) -> Dict[str, Any]:
         "problem_description": problem_description
     }
 
+# ============ STORAGE & RETENTION ============
+
+def created_at_range(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, Any]:
+    """Build a created_at filter for the half-open range [start, end)"""
+    bounds = {}
+    if start is not None:
+        bounds["$gte"] = start
+    if end is not None:
+        bounds["$lt"] = end
+    return {"created_at": bounds} if bounds else {}
+
+async def find_created_between(
+    collection,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    extra_filter: Optional[Dict[str, Any]] = None,
+    limit: int = 100,
+    newest_first: bool = True,
+) -> List[Dict[str, Any]]:
+    """Fetch up to `limit` documents whose created_at falls in [start, end), sorted by created_at"""
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    query = {**(extra_filter or {}), **created_at_range(start, end)}
+    cursor = collection.find(query, {"_id": 0}).sort(
+        "created_at", DESCENDING if newest_first else ASCENDING
+    ).limit(limit)
+    return await cursor.to_list(length=limit)
+
+async def count_created_between(
+    collection,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    extra_filter: Optional[Dict[str, Any]] = None,
+) -> int:
+    """Count documents whose created_at falls in [start, end)"""
+    query = {**(extra_filter or {}), **created_at_range(start, end)}
+    return await collection.count_documents(query)
+
+async def migrate_created_at_to_datetime(collection, batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """Convert legacy ISO-string created_at values to native datetimes, batch by batch
+
+    Unparseable values fall back to the ObjectId insert time; documents without
+    an ObjectId are left untouched and logged.
+    """
+    converted = 0
+    last_id = None
+    while True:
+        query = {"created_at": {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = await collection.find(query, {"_id": 1, "created_at": 1}).sort(
+            "_id", ASCENDING
+        ).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+
+        ops = []
+        for doc in docs:
+            try:
+                created_at = datetime.fromisoformat(doc["created_at"])
+            except ValueError:
+                if not isinstance(doc["_id"], ObjectId):
+                    logger.warning(f"Unparseable created_at left as-is in {collection.name}: {doc['_id']}")
+                    continue
+                logger.warning(f"Unparseable created_at in {collection.name}: {doc['_id']}, using insert time")
+                created_at = doc["_id"].generation_time
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"created_at": created_at}}))
+
+        if ops:
+            result = await collection.bulk_write(ops, ordered=False)
+            converted += result.modified_count
+
+    if converted:
+        logger.info(f"Migrated {converted} created_at values in {collection.name}")
+    return converted
+
+async def backfill_email_captured(batch_size: int = MIGRATION_BATCH_SIZE) -> None:
+    """Flag legacy quiz_results with whether an email was captured for them"""
+    missing = {"email_captured": {"$exists": False}}
+    if not await db.quiz_results.count_documents(missing, limit=1):
+        return
+
+    batch = []
+    async for capture in db.email_captures.find({}, {"_id": 0, "quiz_result_id": 1}):
+        batch.append(capture["quiz_result_id"])
+        if len(batch) >= batch_size:
+            await db.quiz_results.update_many(
+                {"id": {"$in": batch}, **missing}, {"$set": {"email_captured": True}}
+            )
+            batch = []
+    if batch:
+        await db.quiz_results.update_many(
+            {"id": {"$in": batch}, **missing}, {"$set": {"email_captured": True}}
+        )
+
+    result = await db.quiz_results.update_many(missing, {"$set": {"email_captured": False}})
+    logger.info(f"Backfilled email_captured, {result.modified_count} anonymous quiz results")
+
+async def ensure_indexes() -> None:
+    """Create created_at indexes and apply the quiz_results retention policy"""
+    for collection in (db.quiz_results, db.email_captures, db.orders):
+        await collection.create_index([("created_at", ASCENDING)])
+
+    existing = await db.quiz_results.index_information()
+    if QUIZ_RESULT_RETENTION_MODE != "ttl":
+        if QUIZ_RESULT_TTL_INDEX in existing:
+            await db.quiz_results.drop_index(QUIZ_RESULT_TTL_INDEX)
+            logger.info("Dropped quiz_results TTL index")
+        return
+
+    ttl_seconds = QUIZ_RESULT_RETENTION_DAYS * 86400
+    if QUIZ_RESULT_TTL_INDEX in existing:
+        if existing[QUIZ_RESULT_TTL_INDEX].get("expireAfterSeconds") != ttl_seconds:
+            await db.command(
+                "collMod", "quiz_results",
+                index={"name": QUIZ_RESULT_TTL_INDEX, "expireAfterSeconds": ttl_seconds}
+            )
+            logger.info(f"Updated quiz_results TTL to {QUIZ_RESULT_RETENTION_DAYS} days")
+        return
+
+    # Keyed descending so it can coexist with the plain ascending created_at index
+    await db.quiz_results.create_index(
+        [("created_at", DESCENDING)],
+        name=QUIZ_RESULT_TTL_INDEX,
+        expireAfterSeconds=ttl_seconds,
+        partialFilterExpression={"email_captured": False}
+    )
+    logger.info(f"Created quiz_results TTL index ({QUIZ_RESULT_RETENTION_DAYS} days)")
+
+def _write_archive(path: Path, docs: List[Dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # "x" refuses to overwrite an existing archive; fsync before the caller deletes from Mongo
+    with open(path, "xb") as raw:
+        with gzip.open(raw, "wt", encoding="utf-8") as f:
+            for doc in docs:
+                f.write(json.dumps(doc, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v)))
+                f.write("\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+
+async def archive_old_quiz_results(batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """Move anonymous quiz_results past the retention window into gzipped JSONL files"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=QUIZ_RESULT_RETENTION_DAYS)
+    query = {"email_captured": False, **created_at_range(end=cutoff)}
+    run_stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    run_id = uuid.uuid4().hex[:8]
+    archived = 0
+    part = 0
+
+    while True:
+        docs = await db.quiz_results.find(query, {"_id": 0}).sort(
+            "created_at", ASCENDING
+        ).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            break
+
+        path = QUIZ_RESULT_ARCHIVE_DIR / f"quiz_results_{run_stamp}_{run_id}_{part:05d}.jsonl.gz"
+        await asyncio.to_thread(_write_archive, path, docs)
+        # Re-check the retention criteria so results that got an email meanwhile survive
+        result = await db.quiz_results.delete_many(
+            {"id": {"$in": [doc["id"] for doc in docs]}, **query}
+        )
+        archived += result.deleted_count
+        part += 1
+        if result.deleted_count < len(docs):
+            logger.warning(
+                f"Archive batch {path.name}: deleted {result.deleted_count} of {len(docs)} "
+                "quiz results, stopping this run"
+            )
+            break
+
+    if archived:
+        logger.info(f"Archived {archived} quiz results older than {cutoff.isoformat()}")
+    return archived
+
+async def run_archive_loop() -> None:
+    while True:
+        try:
+            await archive_old_quiz_results()
+        except Exception as e:
+            logger.error(f"Error archiving quiz results: {str(e)}")
+        await asyncio.sleep(QUIZ_RESULT_ARCHIVE_INTERVAL_SECONDS)
+
 # ============ API ROUTES ============
 
 @api_router.get("/")
@@ -280,9 +486,9 @@ async def submit_quiz(submission: QuizSubmission):
             answers=[ans.model_dump() for ans in submission.answers]
         )
         
-        # Save to database
+        # Save to database; email_captured drives retention of anonymous results
         doc = quiz_result.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
+        doc['email_captured'] = False
         await db.quiz_results.insert_one(doc)
         
         logger.info(f"Quiz submitted: {quiz_result.id}, Score: {quiz_result.score}, Persona: {quiz_result.persona}")
@@ -307,8 +513,11 @@ async def capture_email(request: EmailCaptureRequest):
             quiz_result_id=request.quiz_result_id
         )
         doc = email_capture.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
         await db.email_captures.insert_one(doc)
+        await db.quiz_results.update_one(
+            {"id": request.quiz_result_id},
+            {"$set": {"email_captured": True}}
+        )
         
         # Send email with results
         html_content = f"""
@@ -361,7 +570,7 @@ async def capture_email(request: EmailCaptureRequest):
 @api_router.get("/quiz/result/{result_id}")
 async def get_quiz_result(result_id: str):
     """Get quiz result by ID"""
-    result = await db.quiz_results.find_one({"id": result_id}, {"_id": 0})
+    result = await db.quiz_results.find_one({"id": result_id}, {"_id": 0, "email_captured": 0})
     if not result:
         raise HTTPException(status_code=404, detail="Quiz result not found")
     return result
@@ -379,7 +588,6 @@ async def create_order(order_create: OrderCreate):
         )
         
         doc = order.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
         await db.orders.insert_one(doc)
         
         logger.info(f"Order created: {order.id}, Plan: {order.plan}, Amount: {order.amount}")
@@ -423,6 +631,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+archive_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def prepare_db():
+    global archive_task
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error preparing database: {str(e)}")
+
+    if QUIZ_RESULT_RETENTION_MODE == "archive":
+        archive_task = asyncio.create_task(run_archive_loop())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if archive_task:
+        archive_task.cancel()
     client.close()
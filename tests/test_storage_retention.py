@@ -0,0 +1,112 @@
+import asyncio
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def db(monkeypatch):
+    mock_db = mongomock_motor.AsyncMongoMockClient(tz_aware=True)["test_database"]
+    monkeypatch.setattr(server, "db", mock_db)
+    return mock_db
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_created_at_range_is_half_open():
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    end = datetime(2025, 2, 1, tzinfo=timezone.utc)
+
+    assert server.created_at_range(start, end) == {"created_at": {"$gte": start, "$lt": end}}
+    assert server.created_at_range(start=start) == {"created_at": {"$gte": start}}
+    assert server.created_at_range(end=end) == {"created_at": {"$lt": end}}
+
+
+def test_created_at_range_empty():
+    assert server.created_at_range() == {}
+
+
+def test_find_created_between_excludes_end(db):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    end = datetime(2025, 1, 3, tzinfo=timezone.utc)
+    run(db.orders.insert_many([
+        {"id": "before", "created_at": start - timedelta(seconds=1)},
+        {"id": "start", "created_at": start},
+        {"id": "middle", "created_at": start + timedelta(days=1)},
+        {"id": "end", "created_at": end},
+    ]))
+
+    docs = run(server.find_created_between(db.orders, start, end, newest_first=False))
+
+    assert [doc["id"] for doc in docs] == ["start", "middle"]
+
+
+def test_find_created_between_requires_positive_limit(db):
+    with pytest.raises(ValueError):
+        run(server.find_created_between(db.orders, limit=0))
+
+
+def test_migrate_created_at_converts_iso_strings(db):
+    run(db.orders.insert_many([
+        {"id": "aware", "created_at": "2025-03-04T05:06:07.123456+00:00"},
+        {"id": "naive", "created_at": "2025-03-04T05:06:07"},
+        {"id": "native", "created_at": datetime(2025, 1, 1, tzinfo=timezone.utc)},
+    ]))
+
+    converted = run(server.migrate_created_at_to_datetime(db.orders, batch_size=1))
+
+    assert converted == 2
+    docs = {doc["id"]: doc for doc in run(db.orders.find({}).to_list(length=None))}
+    assert docs["aware"]["created_at"] == datetime(2025, 3, 4, 5, 6, 7, 123000, tzinfo=timezone.utc)
+    assert docs["naive"]["created_at"] == datetime(2025, 3, 4, 5, 6, 7, tzinfo=timezone.utc)
+    for doc in docs.values():
+        assert isinstance(doc["created_at"], datetime)
+        assert doc["created_at"].tzinfo is not None
+
+
+def test_migrate_created_at_falls_back_to_insert_time(db):
+    run(db.orders.insert_one({"id": "garbage", "created_at": "not a date"}))
+
+    run(server.migrate_created_at_to_datetime(db.orders))
+
+    doc = run(db.orders.find_one({"id": "garbage"}))
+    assert doc["created_at"] == doc["_id"].generation_time.replace(microsecond=0)
+
+
+def test_archive_old_quiz_results(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "QUIZ_RESULT_ARCHIVE_DIR", tmp_path)
+    monkeypatch.setattr(server, "QUIZ_RESULT_RETENTION_DAYS", 30)
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=31)
+    run(db.quiz_results.insert_many([
+        {"id": "old-anonymous", "email_captured": False, "created_at": old},
+        {"id": "old-captured", "email_captured": True, "created_at": old},
+        {"id": "new-anonymous", "email_captured": False, "created_at": now},
+    ]))
+
+    archived = run(server.archive_old_quiz_results())
+
+    assert archived == 1
+    remaining = run(db.quiz_results.distinct("id"))
+    assert sorted(remaining) == ["new-anonymous", "old-captured"]
+
+    files = list(tmp_path.glob("quiz_results_*.jsonl.gz"))
+    assert len(files) == 1
+    with gzip.open(files[0], "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert [row["id"] for row in rows] == ["old-anonymous"]